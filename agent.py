@@ -2,13 +2,86 @@
 This version supports: asking for missing profile fields, handling numeric responses,
 and asking for ASR re-record when confidence is low.
 """
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterable, List, Optional
 import re
 
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick is optional; KeywordMatcher falls back to a compiled regex
+    ahocorasick = None
+
 from src.tools.eligibility_engine import check_eligibility
 from src.tools.mock_api import submit_application
 from src.tools.retrieval import search_schemes, get_scheme_by_id
-from src.memory.store import get_session, set_waiting, add_history
+from src.memory import store
+
+# Keyword lists for dialog intents (Telugu first, English fallbacks). Extend freely.
+YES_TOKENS = ("అవును", "అవు", "సరే", "yes")
+NO_TOKENS = ("లేదు", "కాదు", "no")
+DETAILS_TOKENS = ("వివర", "వివరాలు", "details", "more", "about")
+
+# Bits of session["_missing_mask"]: profile fields still to be collected.
+AGE_BIT = 1
+INCOME_BIT = 2
+_FIELD_BITS = {"age": AGE_BIT, "income": INCOME_BIT}
+
+# Patterns used on every turn, compiled once.
+_AGE_RE = re.compile(r"(\d{1,3})")
+_INCOME_RE = re.compile(r"(\d{3,})")
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+class KeywordMatcher:
+    """Case-insensitive "does the text contain any of these tokens" check in one linear scan.
+
+    Uses a pyahocorasick automaton when available, otherwise a single regex alternation. With
+    `whole_words=True`, ASCII tokens only match on word boundaries (so "no" doesn't match "know");
+    Telugu tokens always match as substrings to allow for inflected forms.
+    """
+
+    def __init__(self, tokens: Iterable[str], whole_words: bool = False):
+        self.tokens = tuple(t.lower() for t in tokens)
+        # an empty alternation (or an empty token) would match every string
+        if not self.tokens or not all(self.tokens):
+            raise ValueError("KeywordMatcher needs at least one non-empty token")
+        self.whole_words = whole_words
+        self._automaton = None
+        self._regex = None
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for tok in self.tokens:
+                self._automaton.add_word(tok, tok)
+            self._automaton.make_automaton()
+        else:
+            parts = []
+            for tok in sorted(self.tokens, key=len, reverse=True):
+                pat = re.escape(tok)
+                if whole_words and tok.isascii():
+                    pat = rf"\b{pat}\b"
+                parts.append(pat)
+            self._regex = re.compile("|".join(parts), re.IGNORECASE)
+
+    def search(self, text: str) -> bool:
+        if not text:
+            return False
+        if self._regex is not None:
+            return self._regex.search(text) is not None
+        t = text.lower()
+        for end, tok in self._automaton.iter(t):
+            if not (self.whole_words and tok.isascii()):
+                return True
+            start = end - len(tok) + 1
+            if (start == 0 or not _is_word_char(t[start - 1])) and (end + 1 == len(t) or not _is_word_char(t[end + 1])):
+                return True
+        return False
+
+
+_YES = KeywordMatcher(YES_TOKENS, whole_words=True)
+_NO = KeywordMatcher(NO_TOKENS, whole_words=True)
+_DETAILS = KeywordMatcher(DETAILS_TOKENS)
 
 
 def parse_confirmation(transcript: str) -> bool | None:
@@ -17,12 +90,8 @@ def parse_confirmation(transcript: str) -> bool | None:
     """
     if not transcript:
         return None
-    t = transcript.strip().lower()
-    yes_tokens = ["అవును", "అవు", "సరే", "yes"]
-    no_tokens = ["లేదు", "కాదు", "no"]
-
-    found_yes = any(tok in t for tok in yes_tokens)
-    found_no = any(tok in t for tok in no_tokens)
+    found_yes = _YES.search(transcript)
+    found_no = _NO.search(transcript)
     if found_yes and not found_no:
         return True
     if found_no and not found_yes:
@@ -30,14 +99,73 @@ def parse_confirmation(transcript: str) -> bool | None:
     return None
 
 
+_UNSET = object()
+
+
+class SessionCache:
+    """Per-turn session reads and buffered writes, keyed by session_id.
+
+    `get` reads the session from the backing store once per turn; later calls in the same turn
+    reuse that dict. `set_waiting` updates the dict immediately (so planning sees it) and
+    `add_history` appends to a pending list. `flush` writes both to the store and drops the entry,
+    so the next turn re-reads the store and sees changes made by other endpoints or workers.
+    """
+
+    def __init__(self):
+        # session_id -> [session dict, pending (role, text) history, pending waiting_for or _UNSET]
+        self._entries: Dict[str, List[Any]] = {}
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(session_id)
+        if entry is not None:
+            return entry[0]
+        session = store.get_session(session_id)
+        if not session:
+            return session
+        self._entries[session_id] = [session, [], _UNSET]
+        return session
+
+    def set_waiting(self, session_id: str, field: Optional[str]) -> None:
+        entry = self._entries[session_id]
+        entry[0]["waiting_for"] = field
+        entry[2] = field
+
+    def add_history(self, session_id: str, role: str, text: str) -> None:
+        self._entries[session_id][1].append((role, text))
+
+    def flush(self, session_id: str) -> None:
+        entry = self._entries.pop(session_id, None)
+        if entry is None:
+            return
+        _, history, waiting = entry
+        for role, text in history:
+            store.add_history(session_id, role, text)
+        if waiting is not _UNSET:
+            store.set_waiting(session_id, waiting)
+
+
+_sessions = SessionCache()
+
+
+def _lowered_names(schemes: List[Dict[str, Any]]) -> List[tuple]:
+    """Precompute (name, id) in lower case for each scheme so lookups don't re-lower per turn."""
+    return [(s.get("name", "").lower(), s.get("id", "").lower(), s) for s in schemes]
+
+
+def _clear_missing(session: Dict[str, Any], field: str) -> None:
+    # if the mask hasn't been derived yet, Planner.plan will build it from the profile
+    if "_missing_mask" in session:
+        session["_missing_mask"] &= ~_FIELD_BITS[field]
+
+
 class Planner:
-    def plan(self, session: Dict[str, Any], transcript: str, confidence: float) -> List[Dict[str, Any]]:
-        """Decide next step based on session state, transcript and ASR confidence."""
-        steps: List[Dict[str, Any]] = []
+    __slots__ = ()
+
+    def plan(self, session: Dict[str, Any], transcript: str, confidence: float) -> Optional[Dict[str, Any]]:
+        """Decide the next step based on session state, transcript and ASR confidence."""
         # If ASR confidence low, instruct to clarify
         if confidence < 0.6:
-            steps.append({"step": "clarify_asr"})
-            return steps
+            return {"step": "clarify_asr"}
 
         # If waiting for a specific field, route to the appropriate handler
         waiting = session.get("waiting_for")
@@ -45,64 +173,68 @@ class Planner:
             # allow asking for scheme details even when waiting for confirmation
             if waiting == "confirmation":
                 # if the user asks for details about a scheme, plan describe_scheme
-                if any(k in (transcript or "").lower() for k in ["వివర", "వివరాలు", "details", "more", "about"]):
-                    steps.append({"step": "describe_scheme", "query": transcript})
-                    return steps
-                steps.append({"step": "confirm"})
-                return steps
-            steps.append({"step": "fill_field", "field": waiting})
-            return steps
+                if _DETAILS.search(transcript):
+                    return {"step": "describe_scheme", "query": transcript}
+                return {"step": "confirm"}
+            return {"step": "fill_field", "field": waiting}
 
         # If we have insufficient profile data, start asking
-        profile = session.get("profile", {})
-        missing = [f for f in ["age", "income"] if profile.get(f) is None]
-        if missing:
-            steps.append({"step": "ask_field", "field": missing[0]})
-            return steps
+        mask = session.get("_missing_mask")
+        if mask is None:
+            # first turn for this session: derive the mask from the profile once
+            profile = session.get("profile", {})
+            mask = 0
+            for field, bit in _FIELD_BITS.items():
+                if profile.get(field) is None:
+                    mask |= bit
+            session["_missing_mask"] = mask
+        if mask:
+            return {"step": "ask_field", "field": "age" if mask & AGE_BIT else "income"}
 
         # Otherwise check eligibility
-        steps.append({"step": "check_eligibility"})
-        return steps
+        return {"step": "check_eligibility"}
 
 
 class Executor:
-    def execute(self, step: Dict[str, Any], session_id: str, transcript: str) -> Dict[str, Any]:
+    __slots__ = ()
+
+    def execute(self, step: Dict[str, Any], session_id: str, session: Dict[str, Any], transcript: str) -> Dict[str, Any]:
+        """Run one planned step against `session`, the dict already held by the caller for `session_id`."""
         name = step.get("step")
-        session = get_session(session_id)
         if not session:
             return {"status": "error", "error": "no_session"}
 
         if name == "clarify_asr":
-            set_waiting(session_id, None)
+            _sessions.set_waiting(session_id, None)
             # Telugu clarification prompt
             reply = "క్షమించండి, నేను స్పష్టంగా వినలేకపోయాను. దయచేసి మళ్లీ రికార్డ్ చేయండి."
-            add_history(session_id, "assistant", reply)
+            _sessions.add_history(session_id, "assistant", reply)
             return {"status": "clarify", "reply": reply}
 
         if name == "ask_field":
             field = step.get("field")
             if field == "age":
                 reply = "దయచేసి మీ వయస్సును చెప్పండి."  # "Please tell me your age"
-                set_waiting(session_id, "age")
+                _sessions.set_waiting(session_id, "age")
             elif field == "income":
                 reply = "దయచేసి మీ వార్షిక ఆదాయాన్ని (ఒక సంఖ్యలో) చెప్పండి."  # "Please state your annual income as a number"
-                set_waiting(session_id, "income")
+                _sessions.set_waiting(session_id, "income")
             else:
                 reply = "సమాధానం తెలియదు."
-            add_history(session_id, "assistant", reply)
+            _sessions.add_history(session_id, "assistant", reply)
             return {"status": "ask", "reply": reply}
 
         if name == "fill_field":
             field = step.get("field")
-            filled = self._parse_and_set_field(session_id, field, transcript)
+            filled = self._parse_and_set_field(session, field, transcript)
             if not filled:
                 # couldn't parse, ask again
                 reply = f"క్షమించండి, మీ {field} గురించి స్పష్టంగా చెప్పగలరా?"
-                set_waiting(session_id, field)
-                add_history(session_id, "assistant", reply)
+                _sessions.set_waiting(session_id, field)
+                _sessions.add_history(session_id, "assistant", reply)
                 return {"status": "ask", "reply": reply}
             else:
-                set_waiting(session_id, None)
+                _sessions.set_waiting(session_id, None)
                 # continue planning next step
                 return {"status": "filled", "field": field}
 
@@ -110,36 +242,36 @@ class Executor:
             profile = session.get("profile", {})
             eligible = check_eligibility(profile)
             session["last_eligibility"] = eligible
+            session["_last_lower"] = _lowered_names(eligible)
             if eligible:
                 # present first few results
                 names = ", ".join([s["name"] for s in eligible])
                 reply = f"మీకు ఈ పథకాలకు అర్హత ఉంది: {names}. మీరు దరఖాస్తు చేయాలనుకుంటున్నారా? (అవును/లేదు)"
-                set_waiting(session_id, "confirmation")
+                _sessions.set_waiting(session_id, "confirmation")
             else:
                 reply = "క్షమించండి, ప్రస్తుత సమాచారం ప్రకారం మీకు తెలియజేసేందుకు అనుకూలమైన పథకం కనిపించలేదు."
-                set_waiting(session_id, None)
-            add_history(session_id, "assistant", reply)
+                _sessions.set_waiting(session_id, None)
+            _sessions.add_history(session_id, "assistant", reply)
             return {"status": "eligible_check", "reply": reply, "eligible": eligible}
 
         if name == "describe_scheme":
             # try to find scheme by name/id from the query or from last_eligibility
             query = step.get("query") or transcript or ""
-            session = get_session(session_id)
-            last = session.get("last_eligibility") or []
+            last_lower = session.get("_last_lower")
+            if last_lower is None:
+                last_lower = _lowered_names(session.get("last_eligibility") or [])
 
             # search among last eligible schemes first
-            hits = []
-            for s in last:
-                if s.get("name", "").lower() in (query or "").lower() or s.get("id", "").lower() in (query or "").lower():
-                    hits.append(s)
+            q = query.lower()
+            hits = [s for nm, id_, s in last_lower if nm in q or id_ in q]
             if not hits:
                 # fallback to global search
                 hits = search_schemes(query)
 
             if not hits:
                 reply = "క్షమించండి, ఆ పథకం గురించి వివరాలు నాకు లభించలేదు. మీరు మరొకటి అడగాలనుకుంటున్నారా?"
-                set_waiting(session_id, "confirmation")
-                add_history(session_id, "assistant", reply)
+                _sessions.set_waiting(session_id, "confirmation")
+                _sessions.add_history(session_id, "assistant", reply)
                 return {"status": "no_details", "reply": reply}
 
             # return description of first hit
@@ -147,8 +279,8 @@ class Executor:
             doc = get_scheme_by_id(first.get("id"))
             reply = f"{doc.get('name')}: {doc.get('description')}"
             # keep waiting for confirmation (user must still accept/decline)
-            set_waiting(session_id, "confirmation")
-            add_history(session_id, "assistant", reply)
+            _sessions.set_waiting(session_id, "confirmation")
+            _sessions.add_history(session_id, "assistant", reply)
             return {"status": "describe", "reply": reply}
 
         if name == "confirm":
@@ -159,48 +291,51 @@ class Executor:
                 res = submit_application({"profile": profile})
                 app_id = res.get("application_id")
                 reply = f"మీ దరఖాస్తు విజయవంతంగా సమర్పించబడింది. దరఖాస్తు ID: {app_id}"
-                add_history(session_id, "assistant", reply)
-                set_waiting(session_id, None)
+                _sessions.add_history(session_id, "assistant", reply)
+                _sessions.set_waiting(session_id, None)
                 return {"status": "submitted", "reply": reply, "application_id": app_id}
             elif parsed is False:
                 reply = "సరే, నేను దరఖాస్తును నిలిపివెతున్నాను. మరింత సహాయం కావాలనుకుంటే చెప్పండి."
-                add_history(session_id, "assistant", reply)
-                set_waiting(session_id, None)
+                _sessions.add_history(session_id, "assistant", reply)
+                _sessions.set_waiting(session_id, None)
                 return {"status": "declined", "reply": reply}
             else:
                 # unclear, ask explicitly
                 reply = "దయచేసి అవును లేదా కాదు అని చెప్పగలరా? (అవును/లేదు)"
-                set_waiting(session_id, "confirmation")
-                add_history(session_id, "assistant", reply)
+                _sessions.set_waiting(session_id, "confirmation")
+                _sessions.add_history(session_id, "assistant", reply)
                 return {"status": "confirm_ask", "reply": reply}
 
         if name == "submit_application":
             profile = session.get("profile", {})
             res = submit_application({"profile": profile})
             reply = f"Your application has been submitted. ID: {res.get('application_id')}"
-            add_history(session_id, "assistant", reply)
-            set_waiting(session_id, None)
+            _sessions.add_history(session_id, "assistant", reply)
+            _sessions.set_waiting(session_id, None)
             return {"status": "submitted", "reply": reply}
         return {"status": "unknown_step"}
 
-    def _parse_and_set_field(self, session_id: str, field: str, transcript: str) -> bool:
-        session = get_session(session_id)
+    def _parse_and_set_field(self, session: Dict[str, Any], field: str, transcript: str) -> bool:
         if field == "age":
-            m = re.search(r"(\d{1,3})", transcript)
+            m = _AGE_RE.search(transcript)
             if m:
                 session["profile"]["age"] = int(m.group(1))
+                _clear_missing(session, "age")
                 return True
             return False
         if field == "income":
-            m = re.search(r"(\d{3,})", transcript.replace(",", ""))
+            m = _INCOME_RE.search(transcript.replace(",", ""))
             if m:
                 session["profile"]["income"] = int(m.group(1))
+                _clear_missing(session, "income")
                 return True
             return False
         return False
 
 
 class Evaluator:
+    __slots__ = ()
+
     def evaluate(self, exec_out: Dict[str, Any]) -> Dict[str, Any]:
         # For demo, rely on executor outputs; could add hallucination checks.
         return exec_out
@@ -209,56 +344,46 @@ class Evaluator:
 class Agent:
     """Facade to manage a session-based, multi-turn agentic loop."""
 
+    __slots__ = ("planner", "executor", "evaluator")
+
     def __init__(self):
         self.planner = Planner()
         self.executor = Executor()
         self.evaluator = Evaluator()
 
     def process_input(self, session_id: str, transcript: str, confidence: float, language: str = "te") -> Dict[str, Any]:
-        session = get_session(session_id)
+        session = _sessions.get(session_id)
         if not session:
             return {"status": "error", "error": "session_not_found"}
 
         # record user utterance
-        add_history(session_id, "user", transcript)
-
+        _sessions.add_history(session_id, "user", transcript)
+        try:
+            return self._run_steps(session, session_id, transcript, confidence)
+        finally:
+            # write the turn's buffered history/waiting state to the store once
+            _sessions.flush(session_id)
+
+    def _run_steps(self, session: Dict[str, Any], session_id: str, transcript: str, confidence: float) -> Dict[str, Any]:
         response: Optional[Dict[str, Any]] = None
         # Allow multiple micro-steps in one call (e.g., fill age -> ask income)
         for _ in range(5):
-            plan = self.planner.plan(session, transcript, confidence)
-            if not plan:
+            step = self.planner.plan(session, transcript, confidence)
+            if step is None:
                 break
-            any_action = False
-            for step in plan:
-                any_action = True
-                exec_out = self.executor.execute(step, session_id, transcript)
-                eval_out = self.evaluator.evaluate(exec_out)
-                response = eval_out
-                # If executor returned a reply, return early
-                if exec_out.get("reply"):
-                    out = {
-                        "status": eval_out.get("status"),
-                        "reply": eval_out.get("reply"),
-                        "eligible": eval_out.get("eligible"),
-                    }
-                    if exec_out.get("application_id"):
-                        out["application_id"] = exec_out.get("application_id")
-                    return out
-                # If we filled a field, continue the outer loop to plan next step
-                if eval_out.get("status") == "filled":
-                    # refresh session and re-plan
-                    session = get_session(session_id)
-                    break
-            if not any_action:
+            response = self.evaluator.evaluate(self.executor.execute(step, session_id, session, transcript))
+            # A reply ends the turn; only a filled field (session updated in place) re-plans
+            if response.get("reply") or response.get("status") != "filled":
                 break
 
-        # Fallback return
+        if response is None:
+            return {"status": "no_action", "reply": "", "eligible": None}
         out = {
-            "status": response.get("status") if response else "no_action",
-            "reply": response.get("reply") if response else "",
-            "eligible": response.get("eligible") if response else None,
+            "status": response.get("status"),
+            "reply": response.get("reply"),
+            "eligible": response.get("eligible"),
         }
-        if response and response.get("application_id"):
+        if response.get("application_id"):
             out["application_id"] = response.get("application_id")
         return out
 
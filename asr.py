@@ -1,9 +1,48 @@
-"""ASR wrapper (Whisper) with confidence scoring and cloud fallback placeholder.
+"""ASR wrapper (Whisper via faster-whisper/CTranslate2) with confidence scoring and cloud fallback placeholder.
 
 Functions return a dictionary: {"text": str, "confidence": float, "raw": dict}.
 Confidence is a heuristic derived from Whisper segment `avg_logprob` values and ranges between 0.0 and 1.0.
 """
 from typing import Optional, Dict, Any
+import os
+import threading
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; fall back to a vectorised NumPy kernel
+    njit = None
+
+# Loaded Whisper models keyed by model name; loading weights dominates per-request latency.
+_MODEL_CACHE: Dict[str, Any] = {}
+_MODEL_LOCK = threading.Lock()
+
+# int8 weights cut memory bandwidth ~4x versus FP32 on CPU; "int8_float16" is a good choice on GPU.
+COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "int8")
+# CTranslate2 worker count: how many transcribe() calls the shared model can run in parallel threads.
+NUM_WORKERS = int(os.getenv("WHISPER_NUM_WORKERS", "2"))
+
+
+def _clamp_mean_confidence(arr: np.ndarray) -> float:
+    """Single pass over `arr`: clamp(1.0 + mean(arr), 0.0, 1.0). `arr` must be non-empty."""
+    s = 0.0
+    n = arr.shape[0]
+    for i in range(n):
+        s += arr[i]
+    c = 1.0 + s / n
+    if c < 0.0:
+        return 0.0
+    if c > 1.0:
+        return 1.0
+    return c
+
+
+if njit is not None:
+    _conf_kernel = njit(cache=True)(_clamp_mean_confidence)
+else:
+    def _conf_kernel(arr: np.ndarray) -> float:
+        return min(1.0, max(0.0, 1.0 + float(arr.mean())))
 
 
 def _compute_confidence(result: Dict[str, Any]) -> float:
@@ -18,13 +57,29 @@ def _compute_confidence(result: Dict[str, Any]) -> float:
     segments = result.get("segments", []) if isinstance(result, dict) else []
     if not segments:
         return 0.0
-    vals = [s.get("avg_logprob") for s in segments if s.get("avg_logprob") is not None]
-    if not vals:
+    vals = np.fromiter(
+        (s["avg_logprob"] for s in segments if s.get("avg_logprob") is not None), dtype=np.float64
+    )
+    if vals.size == 0:
         return 0.0
-    mean = sum(vals) / len(vals)
-    conf = 1.0 + mean
-    conf = max(0.0, min(1.0, conf))
-    return conf
+    return float(_conf_kernel(vals))
+
+
+def load_model(model_name: str = "small") -> Any:
+    """Return the Whisper model for `model_name`, loading it on first use and caching it in-process."""
+    model = _MODEL_CACHE.get(model_name)
+    if model is not None:
+        return model
+    with _MODEL_LOCK:
+        model = _MODEL_CACHE.get(model_name)
+        if model is None:
+            try:
+                from faster_whisper import WhisperModel
+            except Exception as e:
+                raise RuntimeError("faster-whisper is not installed. Install with `pip install faster-whisper`.") from e
+            model = WhisperModel(model_name, device="auto", compute_type=COMPUTE_TYPE, num_workers=NUM_WORKERS)
+            _MODEL_CACHE[model_name] = model
+    return model
 
 
 def transcribe_file(path: str, model_name: str = "small", language: Optional[str] = "te", use_cloud: bool = False) -> Dict[str, Any]:
@@ -35,19 +90,21 @@ def transcribe_file(path: str, model_name: str = "small", language: Optional[str
     if use_cloud:
         return cloud_transcribe(path, language=language)
 
-    try:
-        import whisper
-    except Exception as e:
-        raise RuntimeError("Whisper is not installed. Install with `pip install openai-whisper`.") from e
-
-    model = whisper.load_model(model_name)
+    model = load_model(model_name)
     kwargs = {}
     if language:
         kwargs["language"] = language
         kwargs["task"] = "transcribe"
 
-    result = model.transcribe(path, **kwargs)
-    text = result.get("text", "").strip()
+    segments, info = model.transcribe(path, **kwargs)
+    # segments is a lazy generator; decoding happens while it is consumed here.
+    # Keep the openai-whisper result shape so callers and _compute_confidence are unchanged.
+    segs = [
+        {"start": seg.start, "end": seg.end, "text": seg.text, "avg_logprob": seg.avg_logprob}
+        for seg in segments
+    ]
+    result = {"text": "".join(seg["text"] for seg in segs), "segments": segs, "language": info.language}
+    text = result["text"].strip()
     confidence = _compute_confidence(result)
     return {"text": text, "confidence": confidence, "raw": result}
 
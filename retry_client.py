@@ -2,12 +2,23 @@
 """Client that automatically retries on ASR low confidence by following the agent's clarify prompt.
 Designed to be simple and dependency-light for demos and tests.
 """
-import requests
-import time
-from typing import Optional
+import asyncio
+from typing import List, Optional
+
+import aiohttp
 
 
 class RetryClient:
+    """Async client for the /transcribe -> /agent flow over one pooled HTTP session.
+
+    Use it as an async context manager so the session is closed on the loop that opened it::
+
+        async with RetryClient("http://localhost:8000") as client:
+            await client.run_flow("sample.mp3")
+
+    From synchronous code, `run_flow_sync` / `run_flows_sync` do this for you.
+    """
+
     def __init__(self, server_url: str = "http://localhost:8000", max_retries: int = 3, auto_record: bool = False, record_fn=None):
         """record_fn: optional callable used to record audio during auto re-record. It should
         accept no args and return a file path to the new recording. If not provided and auto_record
@@ -18,31 +29,89 @@ class RetryClient:
         self.auto_record = auto_record
         # record_fn is injectable for tests; default will lazily import src.audio.record_audio.record
         self.record_fn = record_fn
-
-    def transcribe_file(self, path: str):
+        # shared aiohttp session (created lazily) so calls reuse pooled keep-alive connections
+        self._session: Optional[aiohttp.ClientSession] = None
+        # guards lazy session creation when several flows start concurrently
+        self._session_lock = asyncio.Lock()
+        # serializes the interactive prompt/recording so concurrent flows don't share stdin or the mic
+        self._prompt_lock = asyncio.Lock()
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is not None and not self._session.closed:
+            return self._session
+        async with self._session_lock:
+            if self._session is None or self._session.closed:
+                connector = aiohttp.TCPConnector(limit=32, keepalive_timeout=30)
+                self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        # fresh locks so the client can be driven again from a new event loop
+        self._session_lock = asyncio.Lock()
+        self._prompt_lock = asyncio.Lock()
+
+    async def __aenter__(self) -> "RetryClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def transcribe_file(self, path: str):
         url = f"{self.server}/transcribe"
+        session = await self._get_session()
         with open(path, "rb") as f:
-            files = {"file": (path, f, "audio/mp3")}
-            r = requests.post(url, files=files)
-        r.raise_for_status()
-        return r.json()
+            form = aiohttp.FormData()
+            form.add_field("file", f, filename=path, content_type="audio/mp3")
+            async with session.post(url, data=form) as r:
+                r.raise_for_status()
+                return await r.json()
 
-    def call_agent(self, transcript: str, confidence: float, session_id: Optional[str] = None):
+    async def call_agent(self, transcript: str, confidence: float, session_id: Optional[str] = None):
         url = f"{self.server}/agent"
         payload = {"transcript": transcript, "confidence": confidence}
         if session_id:
             payload["session_id"] = session_id
-        r = requests.post(url, json=payload)
-        r.raise_for_status()
-        return r.json()
+        session = await self._get_session()
+        async with session.post(url, json=payload) as r:
+            r.raise_for_status()
+            return await r.json()
 
-    def speak(self, text: str, lang: str = "te"):
+    async def speak(self, text: str, lang: str = "te"):
         url = f"{self.server}/speak"
-        r = requests.post(url, json={"text": text, "lang": lang})
-        r.raise_for_status()
-        return r.json()
+        session = await self._get_session()
+        async with session.post(url, json={"text": text, "lang": lang}) as r:
+            r.raise_for_status()
+            return await r.json()
+
+    def _run_sync(self, coro):
+        async def _run():
+            async with self:
+                return await coro
 
-    def run_flow(self, audio_path: str, auto_retry: bool = False):
+        return asyncio.run(_run())
+
+    def run_flow_sync(self, *args, **kwargs):
+        """Blocking wrapper around `run_flow` for the CLI; closes the shared session when done."""
+        return self._run_sync(self.run_flow(*args, **kwargs))
+
+    def run_flows_sync(self, *args, **kwargs):
+        """Blocking wrapper around `run_flows`."""
+        return self._run_sync(self.run_flows(*args, **kwargs))
+
+    async def run_flows(self, paths: List[str], auto_retry: bool = False):
+        """Run `run_flow` for every path concurrently over the shared session.
+
+        `max_retries` applies to each flow independently. Results are returned in the order of
+        `paths`; a flow that raised is returned as its exception instead of cancelling the batch.
+        Retry prompts and re-recordings are handled one flow at a time.
+        """
+        tasks = [self.run_flow(p, auto_retry=auto_retry) for p in paths]
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def run_flow(self, audio_path: str, auto_retry: bool = False):
         """Run the transcribe -> agent flow with retry on low-confidence.
 
         If `auto_retry` is True the client will automatically retry without prompting the user.
@@ -55,7 +124,7 @@ class RetryClient:
         while attempts < self.max_retries:
             attempts += 1
             print(f"Attempt {attempts}: sending audio to /transcribe -> {audio_path}")
-            resp = self.transcribe_file(audio_path)
+            resp = await self.transcribe_file(audio_path)
             print("Transcribe response:", resp)
             last_transcript = resp.get("text", "")
             last_conf = float(resp.get("confidence", 0.0))
@@ -63,42 +132,50 @@ class RetryClient:
             if resp.get("low_confidence"):
                 prompt = resp.get("clarify_prompt") or "I couldn't understand, please repeat."
                 print("Low confidence detected. Clarify prompt (Telugu):", prompt)
-                # auto_retry True will re-try immediately; otherwise interactive prompt
+                # auto_retry True will re-try immediately; otherwise interactive prompt.
+                # Blocking recorder/input calls run in a thread so concurrent flows keep going.
                 if self.auto_record:
                     # perform a re-record using the injected record function or the default recorder
-                    print("Auto-record is enabled: recording new audio...")
-                    if self.record_fn is None:
-                        # lazy import default recorder
-                        try:
-                            from src.audio.record_audio import record as default_record
-                        except Exception:
-                            # fallback: not available in this environment
-                            print("Default recorder unavailable; aborting auto-record")
-                            return None
-
-                        import tempfile
-                        new_file = tempfile.NamedTemporaryFile(suffix=".wav", delete=False).name
-
-                        # record short 3s clip for demo
-                        try:
-                            default_record(duration=3.0, filename=new_file)
-                        except Exception as e:
-                            print("Recording failed:", e)
-                            return None
-                        audio_path = new_file
-                    else:
-                        # record_fn should return a path
-                        audio_path = self.record_fn()
+                    # one recording at a time: concurrent flows in a batch share the microphone
+                    async with self._prompt_lock:
+                        print("Auto-record is enabled: recording new audio...")
+                        if self.record_fn is None:
+                            # lazy import default recorder
+                            try:
+                                from src.audio.record_audio import record as default_record
+                            except Exception:
+                                # fallback: not available in this environment
+                                print("Default recorder unavailable; aborting auto-record")
+                                return None
+
+                            import tempfile
+                            new_file = tempfile.NamedTemporaryFile(suffix=".wav", delete=False).name
+
+                            # record short 3s clip for demo
+                            try:
+                                await asyncio.to_thread(default_record, duration=3.0, filename=new_file)
+                            except Exception as e:
+                                print("Recording failed:", e)
+                                return None
+                            audio_path = new_file
+                        else:
+                            # record_fn should return a path
+                            audio_path = await asyncio.to_thread(self.record_fn)
 
                     print("Re-recorded audio ->", audio_path)
                     # continue to retry with new audio_path (loop continues)
                     continue
                 if auto_retry:
                     print("auto_retry=True -> retrying automatically")
-                    time.sleep(0.2)
+                    await asyncio.sleep(0.2)
                     continue
                 else:
-                    ans = input("Press Enter to retry with the same file, or type 'r' to record new audio (not implemented): ")
+                    # one prompt at a time: concurrent flows in a batch share stdin
+                    async with self._prompt_lock:
+                        ans = await asyncio.to_thread(
+                            input,
+                            f"[{audio_path}] Press Enter to retry with the same file, or type 'r' to record new audio (not implemented): ",
+                        )
                     if ans.strip().lower() == "r":
                         print("Recording not implemented in this CLI demo; please re-run with a new file.")
                         return None
@@ -107,7 +184,7 @@ class RetryClient:
             else:
                 # call agent
                 print("Confidence sufficient, calling /agent with transcript.")
-                agent_resp = self.call_agent(last_transcript, last_conf, session_id=session_id)
+                agent_resp = await self.call_agent(last_transcript, last_conf, session_id=session_id)
                 print("Agent response:", agent_resp)
                 session_id = agent_resp.get("session_id", session_id)
                 # Optionally fetch TTS audio
@@ -123,10 +200,13 @@ if __name__ == "__main__":
     import argparse
 
     parser = argparse.ArgumentParser(description="Retry client for voice agent demo")
-    parser.add_argument("audio", help="Path to audio file (mp3/wav)")
+    parser.add_argument("audio", nargs="+", help="Path(s) to audio file (mp3/wav); several files run concurrently")
     parser.add_argument("--server", default="http://localhost:8000")
     parser.add_argument("--retries", type=int, default=3)
     args = parser.parse_args()
 
     client = RetryClient(server_url=args.server, max_retries=args.retries)
-    client.run_flow(args.audio)
+    if len(args.audio) == 1:
+        client.run_flow_sync(args.audio[0])
+    else:
+        client.run_flows_sync(args.audio, auto_retry=True)
@@ -1,33 +1,153 @@
 """A minimal FastAPI server to demo ASR -> Agent -> TTS flow with confidence and provider options."""
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import FileResponse, JSONResponse, HTMLResponse
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request
+from fastapi.responses import FileResponse, JSONResponse, HTMLResponse, ORJSONResponse, Response
+import asyncio
+import concurrent.futures
+import functools
+import hashlib
+import logging
 import os
+import tempfile
+import threading
+from contextlib import asynccontextmanager
 from pathlib import Path
+import aiofiles
+import orjson
 from dotenv import load_dotenv
 
 load_dotenv()
 ASR_PROVIDER = os.getenv("ASR_PROVIDER", "local")  # 'local' or provider name
 ASR_CONFIDENCE_THRESHOLD = float(os.getenv("ASR_CONFIDENCE_THRESHOLD", "0.6"))
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "small")
 
-from src.asr.asr import transcribe_file
+from src.asr.asr import transcribe_file, load_model, NUM_WORKERS as ASR_WORKERS
 from src.tts.tts import text_to_speech
 from src.tools.retrieval import DOCUMENTS, get_scheme_by_id
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+
+def warm_asr_model():
+    """Load the local Whisper model once at startup so the first request doesn't pay for it."""
+    if ASR_PROVIDER != "local":
+        return
+    try:
+        load_model(WHISPER_MODEL)
+    except Exception:
+        # never block startup on ASR; /transcribe will report the error per request
+        logger.exception("Could not preload ASR model %r", WHISPER_MODEL)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Blocking ASR/TTS work runs in these pools so the event loop keeps serving other requests.
+    # They are created per app run so a restarted app in the same process gets live pools.
+    # The ASR pool matches the model's CTranslate2 num_workers, so each thread gets a decoder.
+    app.state.asr_pool = concurrent.futures.ThreadPoolExecutor(max_workers=ASR_WORKERS, thread_name_prefix="asr")
+    app.state.tts_pool = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="tts")
+    warm_asr_model()
+    try:
+        yield
+    finally:
+        app.state.asr_pool.shutdown(wait=False)
+        app.state.tts_pool.shutdown(wait=False)
+
+
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
 TMP_DIR = Path("tmp")
 TMP_DIR.mkdir(exist_ok=True)
+# Shared TTS renders get their own directory so uploads to TMP_DIR can't overwrite them.
+TTS_DIR = TMP_DIR / "tts"
+TTS_DIR.mkdir(exist_ok=True)
 WEB_DIR = Path(__file__).resolve().parent / "web"
 WEB_DIR.mkdir(exist_ok=True)
+UPLOAD_CHUNK_SIZE = 1 << 16  # 64 KiB
+
+# The scheme catalogue is static, so the /schemes body is encoded once at import.
+_SCHEMES_CACHE = orjson.dumps({
+    "schemes": [
+        {
+            "id": s.get("id"),
+            "name": s.get("name"),
+            "category": s.get("category"),
+            "description": s.get("description"),
+        }
+        for s in DOCUMENTS.values()
+    ]
+})
+
+_SCHEMES_HTML_FILE = WEB_DIR / "schemes.html"
+_SCHEMES_HTML = _SCHEMES_HTML_FILE.read_bytes() if _SCHEMES_HTML_FILE.exists() else None
+
+
+# Upper bound on cached tts_*.mp3 files; the least recently used are removed beyond this.
+TTS_CACHE_MAX_FILES = int(os.getenv("TTS_CACHE_MAX_FILES", "256"))
+_TTS_CACHE_LOCK = threading.Lock()
+
+
+def _tts_path(text: str, lang: str) -> Path:
+    key = hashlib.sha1(f"{lang}|{text}".encode()).hexdigest()
+    return TTS_DIR / f"tts_{key}.mp3"
+
+
+def _evict_tts_cache() -> None:
+    files = []
+    for path in TTS_DIR.glob("tts_*.mp3"):
+        # another worker may evict concurrently; a vanished file is simply skipped
+        try:
+            files.append((path.stat().st_mtime, path))
+        except FileNotFoundError:
+            pass
+    files.sort()
+    for _, old in files[: max(0, len(files) - TTS_CACHE_MAX_FILES)]:
+        try:
+            old.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _synthesize(text: str, lang: str) -> Path:
+    """Return the mp3 for (text, lang), synthesizing it only if it isn't already on disk.
+
+    Replies are often fixed prompts, so renders are keyed by content hash and reused across
+    sessions. The cache is capped at TTS_CACHE_MAX_FILES, evicting by last use (mtime). New
+    renders are written to a temp file and renamed so readers never see a partial mp3.
+    """
+    path = _tts_path(text, lang)
+    if path.exists():
+        try:
+            os.utime(path)  # mark as recently used
+            return path
+        except FileNotFoundError:
+            pass  # evicted in the meantime; render again
+    fd, tmp = tempfile.mkstemp(suffix=".mp3", dir=TTS_DIR)
+    os.close(fd)
+    try:
+        text_to_speech(text, tmp, lang=lang)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    with _TTS_CACHE_LOCK:
+        _evict_tts_cache()
+    return path
 
 
 @app.post("/transcribe")
-async def transcribe(file: UploadFile = File(...)):
-    path = TMP_DIR / file.filename
-    with open(path, "wb") as f:
-        f.write(await file.read())
+async def transcribe(request: Request, file: UploadFile = File(...)):
+    # keep only the base name so a client-chosen filename can't escape TMP_DIR or reach TTS_DIR
+    name = Path(file.filename or "").name
+    path = TMP_DIR / (name if name not in ("", ".", "..") else "upload")
+    # stream the upload to disk in fixed-size chunks so large recordings are never held in memory
+    async with aiofiles.open(path, "wb") as f:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            await f.write(chunk)
     try:
         use_cloud = ASR_PROVIDER != "local"
-        result = transcribe_file(str(path), language="te", use_cloud=use_cloud)
+        result = await asyncio.get_running_loop().run_in_executor(
+            request.app.state.asr_pool,
+            functools.partial(transcribe_file, str(path), model_name=WHISPER_MODEL, language="te", use_cloud=use_cloud),
+        )
         text = result.get("text", "")
         confidence = result.get("confidence", 0.0)
     except NotImplementedError as e:
@@ -44,7 +164,7 @@ async def transcribe(file: UploadFile = File(...)):
 
 
 @app.post("/agent")
-async def agent_endpoint(payload: dict):
+async def agent_endpoint(payload: dict, request: Request):
     """Main agent endpoint.
     Accepts: { "session_id"?: str, "transcript": str, "confidence"?: float }
     If `session_id` is missing, a new one will be created and returned.
@@ -68,8 +188,9 @@ async def agent_endpoint(payload: dict):
     # Synthesize reply if exists
     tts_file = None
     if result.get("reply"):
-        tts_file = TMP_DIR / f"reply_{session_id}.mp3"
-        text_to_speech(result["reply"], str(tts_file), lang="te")
+        tts_file = await asyncio.get_running_loop().run_in_executor(
+            request.app.state.tts_pool, _synthesize, result["reply"], "te"
+        )
 
     response = {"session_id": session_id, "status": result.get("status"), "reply": result.get("reply")}
     if tts_file:
@@ -85,15 +206,7 @@ async def agent_endpoint(payload: dict):
 @app.get("/schemes")
 def list_schemes():
     """Return the available schemes (id, name, category, short description)."""
-    schemes = []
-    for s in DOCUMENTS.values():
-        schemes.append({
-            "id": s.get("id"),
-            "name": s.get("name"),
-            "category": s.get("category"),
-            "description": s.get("description"),
-        })
-    return {"schemes": schemes}
+    return Response(_SCHEMES_CACHE, media_type="application/json")
 
 
 @app.get("/schemes/{scheme_id}")
@@ -106,20 +219,18 @@ def get_scheme(scheme_id: str):
 
 @app.get("/ui/schemes")
 def schemes_ui():
-    html_file = WEB_DIR / "schemes.html"
-    if not html_file.exists():
+    if _SCHEMES_HTML is None:
         raise HTTPException(status_code=404, detail="UI not found")
-    return HTMLResponse(html_file.read_text(), status_code=200)
+    return HTMLResponse(_SCHEMES_HTML, status_code=200, headers={"Cache-Control": "public, max-age=300"})
 
 
 @app.post("/speak")
-async def speak(payload: dict):
+async def speak(payload: dict, request: Request):
     text = payload.get("text")
     lang = payload.get("lang", "te")
     if not text:
         raise HTTPException(status_code=400, detail="Missing text")
-    out = TMP_DIR / "speak.mp3"
-    text_to_speech(text, str(out), lang=lang)
+    out = await asyncio.get_running_loop().run_in_executor(request.app.state.tts_pool, _synthesize, text, lang)
     return {"audio": str(out)}
 
 
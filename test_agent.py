@@ -0,0 +1,116 @@
+import importlib
+
+import pytest
+
+agent_mod = importlib.import_module("src.agent.agent")
+
+
+class FakeStore:
+    """In-memory stand-in for src.memory.store that counts writes."""
+
+    def __init__(self):
+        self.sessions = {}
+        self.history_calls = 0
+        self.waiting_calls = []
+
+    def get_session(self, session_id):
+        return self.sessions.get(session_id)
+
+    def add_history(self, session_id, role, text):
+        self.history_calls += 1
+        self.sessions[session_id]["history"].append((role, text))
+
+    def set_waiting(self, session_id, field):
+        self.waiting_calls.append(field)
+        self.sessions[session_id]["waiting_for"] = field
+
+
+def _new_session(**kwargs):
+    session = {"profile": {}, "waiting_for": None, "history": []}
+    session.update(kwargs)
+    return session
+
+
+def test_turn_writes_are_buffered_and_flushed_once(monkeypatch):
+    fake = FakeStore()
+    fake.sessions["s1"] = _new_session(waiting_for="age")
+    monkeypatch.setattr(agent_mod, "store", fake)
+
+    # fills age (waiting -> None) then asks for income (waiting -> income) in one turn
+    out = agent_mod.Agent().process_input("s1", "నా వయస్సు 25", confidence=0.9)
+
+    assert out["status"] == "ask"
+    record = fake.sessions["s1"]
+    assert record["profile"]["age"] == 25
+    assert record["history"] == [("user", "నా వయస్సు 25"), ("assistant", out["reply"])]
+    assert fake.history_calls == 2
+    # only the final waiting state of the turn reaches the store
+    assert fake.waiting_calls == ["income"]
+    assert record["waiting_for"] == "income"
+
+
+def test_store_changes_are_seen_on_next_turn(monkeypatch):
+    fake = FakeStore()
+    fake.sessions["s1"] = _new_session()
+    monkeypatch.setattr(agent_mod, "store", fake)
+    monkeypatch.setattr(agent_mod, "check_eligibility", lambda profile: [])
+    agent = agent_mod.Agent()
+
+    out = agent.process_input("s1", "హలో", confidence=0.9)
+    assert out["status"] == "ask"
+    assert fake.sessions["s1"]["waiting_for"] == "age"
+
+    # something outside the agent replaces the record with a completed profile
+    fake.sessions["s1"] = _new_session(profile={"age": 30, "income": 100000})
+
+    out = agent.process_input("s1", "హలో", confidence=0.9)
+    assert out["status"] == "eligible_check"
+    assert fake.sessions["s1"]["waiting_for"] is None
+    assert fake.sessions["s1"]["history"][0] == ("user", "హలో")
+
+
+@pytest.fixture(params=["regex", "ahocorasick"])
+def matcher_backend(request, monkeypatch):
+    """Build KeywordMatchers with each backend; the automaton one needs pyahocorasick."""
+    if request.param == "regex":
+        monkeypatch.setattr(agent_mod, "ahocorasick", None)
+    else:
+        monkeypatch.setattr(agent_mod, "ahocorasick", pytest.importorskip("ahocorasick"))
+    return request.param
+
+
+@pytest.mark.parametrize("text, yes, no", [
+    ("yes", True, False),
+    ("Yes.", True, False),
+    ("no", False, True),
+    ("No, thanks", False, True),
+    ("I know", False, False),
+    ("nope", False, False),
+    ("eyes", False, False),
+    ("అవును", True, False),
+    ("సరే చేయండి", True, False),
+    ("లేదు", False, True),
+    ("కాదు, అవును", True, True),
+    ("", False, False),
+])
+def test_keyword_matcher_yes_no(matcher_backend, text, yes, no):
+    assert agent_mod.KeywordMatcher(agent_mod.YES_TOKENS, whole_words=True).search(text) is yes
+    assert agent_mod.KeywordMatcher(agent_mod.NO_TOKENS, whole_words=True).search(text) is no
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("వివరాలు చెప్పండి", True),
+    ("tell me MORE", True),
+    ("what is it about?", True),
+    ("Details", True),
+    ("అవును", False),
+    ("no", False),
+])
+def test_keyword_matcher_details(matcher_backend, text, expected):
+    assert agent_mod.KeywordMatcher(agent_mod.DETAILS_TOKENS).search(text) is expected
+
+
+@pytest.mark.parametrize("tokens", [(), ("yes", "")])
+def test_keyword_matcher_rejects_empty_tokens(matcher_backend, tokens):
+    with pytest.raises(ValueError):
+        agent_mod.KeywordMatcher(tokens)
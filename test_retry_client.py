@@ -1,6 +1,16 @@
+import asyncio
+import threading
+import time
+
 from clients.retry_client import RetryClient
 
 
+async def _run_in_client(client, coro_fn, *args, **kwargs):
+    """Drive `client` inside its async context so the shared session is always closed."""
+    async with client:
+        return await coro_fn(*args, **kwargs)
+
+
 class FakeServer:
     """Simulate /transcribe then /transcribe success on retry, and /agent call.
 
@@ -60,10 +70,16 @@ def test_retry_client_simulated():
     client.requests = dummy  # not used by default methods; we'll monkeypatch methods
 
     # monkeypatch methods to use dummy
-    client.transcribe_file = lambda p: dummy.post("/transcribe", files={}).json()
-    client.call_agent = lambda t, c, session_id=None: dummy.post("/agent", json={}).json()
+    async def transcribe(p):
+        return dummy.post("/transcribe", files={}).json()
+
+    async def call_agent(t, c, session_id=None):
+        return dummy.post("/agent", json={}).json()
 
-    resp = client.run_flow("dummy.mp3", auto_retry=True)
+    client.transcribe_file = transcribe
+    client.call_agent = call_agent
+
+    resp = asyncio.run(_run_in_client(client, client.run_flow, "dummy.mp3", auto_retry=True))
     assert resp is not None
     assert resp.get("status") == "asked_age"
     print("Simulated retry flow passed")
@@ -81,15 +97,91 @@ def test_auto_rerecord_simulated():
     client = RetryClient(server_url="http://localhost:8000", auto_record=True, record_fn=fake_record)
 
     # monkeypatch transcribe to send the 'path' so FakeServer can detect it's the new file
-    def transcribe_with_path(p):
+    async def transcribe_with_path(p):
         return dummy.post("/transcribe", files={"path": p}).json()
 
+    async def call_agent(t, c, session_id=None):
+        return dummy.post("/agent", json={}).json()
+
     client.transcribe_file = transcribe_with_path
-    client.call_agent = lambda t, c, session_id=None: dummy.post("/agent", json={}).json()
+    client.call_agent = call_agent
 
-    resp = client.run_flow("orig.mp3", auto_retry=False)
+    resp = asyncio.run(_run_in_client(client, client.run_flow, "orig.mp3", auto_retry=False))
     assert resp is not None
     assert resp.get("status") == "asked_age"
     # ensure the fake recorded file was used
     assert fake.new_file_created is True
     print("Auto re-record simulated flow passed")
+
+
+def test_run_flows_batch():
+    client = RetryClient(server_url="http://localhost:8000")
+
+    async def transcribe(p):
+        if p == "bad.mp3":
+            raise RuntimeError("upload failed")
+        # finish in reverse order so results must be re-ordered to match paths
+        await asyncio.sleep({"a.mp3": 0.03, "b.mp3": 0.02, "c.mp3": 0.01}[p])
+        return {"text": p, "confidence": 0.95, "low_confidence": False}
+
+    async def call_agent(t, c, session_id=None):
+        return {"session_id": "sess-1", "status": f"done:{t}"}
+
+    client.transcribe_file = transcribe
+    client.call_agent = call_agent
+
+    results = asyncio.run(
+        _run_in_client(client, client.run_flows, ["a.mp3", "bad.mp3", "b.mp3", "c.mp3"], auto_retry=True)
+    )
+    assert len(results) == 4
+    assert results[0] == {"session_id": "sess-1", "status": "done:a.mp3"}
+    assert isinstance(results[1], RuntimeError)
+    assert results[2]["status"] == "done:b.mp3"
+    assert results[3]["status"] == "done:c.mp3"
+    print("Batch flow passed")
+
+
+def test_client_context_closes_session():
+    async def run():
+        async with RetryClient(server_url="http://localhost:8000") as client:
+            session = await client._get_session()
+            assert not session.closed
+        return client, session
+
+    client, session = asyncio.run(run())
+    assert session.closed
+    assert client._session is None
+
+
+def test_run_flows_serializes_rerecording():
+    active = 0
+    max_active = 0
+    guard = threading.Lock()
+
+    # the recorder runs in a worker thread; track how many recordings overlap
+    def fake_record():
+        nonlocal active, max_active
+        with guard:
+            active += 1
+            max_active = max(max_active, active)
+        time.sleep(0.02)
+        with guard:
+            active -= 1
+        return "new_audio.wav"
+
+    client = RetryClient(server_url="http://localhost:8000", auto_record=True, record_fn=fake_record)
+
+    async def transcribe(p):
+        if p == "new_audio.wav":
+            return {"text": "సరే", "confidence": 0.95, "low_confidence": False}
+        return {"text": "", "confidence": 0.1, "low_confidence": True}
+
+    async def call_agent(t, c, session_id=None):
+        return {"session_id": "sess-1", "status": "asked_age"}
+
+    client.transcribe_file = transcribe
+    client.call_agent = call_agent
+
+    results = asyncio.run(_run_in_client(client, client.run_flows, ["a.mp3", "b.mp3", "c.mp3"]))
+    assert [r["status"] for r in results] == ["asked_age"] * 3
+    assert max_active == 1